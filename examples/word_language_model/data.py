@@ -3,7 +3,6 @@ import os
 from skorch.utils import to_device
 
 import torch
-from torch.autograd import Variable
 
 
 class Dictionary:
@@ -59,8 +58,8 @@ class Loader:
         self.bptt = bptt
         self.batch_size = batch_size
         self.device = device
-        if isinstance(source.X, Variable):
-            data = source.X.data.long()
+        if isinstance(source.X, torch.Tensor):
+            data = source.X.long()
         else:
             data = torch.LongTensor(source.X)
         self.batches = self.batchify(data, batch_size)
@@ -70,14 +69,16 @@ class Loader:
         nbatch = data.size(0) // bsz
         # Trim off any extra elements that wouldn't cleanly fit (remainders).
         data = data.narrow(0, 0, nbatch * bsz)
-        # Evenly divide the data across the bsz batches.
+        # Evenly divide the data across the bsz batches. The result is
+        # time-major, (seq_len, bsz), and contiguous so that every bptt
+        # window can be fed to the RNN without another copy.
         data = data.view(bsz, -1).t().contiguous()
         return to_device(data, self.device)
 
     def get_batch(self, i):
         seq_len = min(self.bptt, len(self.batches) - 1 - i)
-        data = Variable(self.batches[i:i+seq_len], volatile=self.evaluation)
-        target = Variable(self.batches[i+1:i+1+seq_len].view(-1))
+        data = self.batches[i:i+seq_len]
+        target = self.batches[i+1:i+1+seq_len].view(-1)
         return data, target
 
     def __iter__(self):
@@ -1,5 +1,89 @@
+from typing import List
+from typing import Tuple
+
+import torch
 import torch.nn as nn
-from torch.autograd import Variable
+
+
+@torch.jit.script
+def lstm_cell(x, h, c, w_ih, w_hh, b_ih, b_hh):
+    # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor]
+    gates = torch.mm(x, w_ih.t()) + torch.mm(h, w_hh.t()) + b_ih + b_hh
+    ingate, forgetgate, cellgate, outgate = gates.chunk(4, 1)
+
+    ingate = torch.sigmoid(ingate)
+    forgetgate = torch.sigmoid(forgetgate)
+    cellgate = torch.tanh(cellgate)
+    outgate = torch.sigmoid(outgate)
+
+    cy = (forgetgate * c) + (ingate * cellgate)
+    hy = outgate * torch.tanh(cy)
+    return hy, cy
+
+
+@torch.jit.script
+def lstm_loop(xs, h, c, w_ih, w_hh, b_ih, b_hh):
+    # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor, Tensor]
+    # The sequence length is only known at run time, so the loop is
+    # not unrolled into the graph and any bptt length can be used.
+    outputs = torch.jit.annotate(List[torch.Tensor], [])
+    for t in range(xs.size(0)):
+        h, c = lstm_cell(xs[t], h, c, w_ih, w_hh, b_ih, b_hh)
+        outputs.append(h)
+    return torch.stack(outputs), h, c
+
+
+class ScriptLSTM(nn.Module):
+    """Multi-layer LSTM whose time loop runs in TorchScript.
+
+    The parameters are named and shaped like those of ``nn.LSTM``,
+    so state dicts can be exchanged between both implementations.
+    This is useful when the fused cuDNN kernel is not available or
+    when the cell itself is to be modified.
+
+    """
+    def __init__(self, input_size, hidden_size, num_layers=1, dropout=0.):
+        super(ScriptLSTM, self).__init__()
+        self.input_size = input_size
+        self.hidden_size = hidden_size
+        self.num_layers = num_layers
+        self.dropout = dropout
+
+        for layer in range(num_layers):
+            layer_input_size = input_size if layer == 0 else hidden_size
+            w_ih = nn.Parameter(torch.Tensor(4 * hidden_size, layer_input_size))
+            w_hh = nn.Parameter(torch.Tensor(4 * hidden_size, hidden_size))
+            b_ih = nn.Parameter(torch.Tensor(4 * hidden_size))
+            b_hh = nn.Parameter(torch.Tensor(4 * hidden_size))
+            setattr(self, 'weight_ih_l{}'.format(layer), w_ih)
+            setattr(self, 'weight_hh_l{}'.format(layer), w_hh)
+            setattr(self, 'bias_ih_l{}'.format(layer), b_ih)
+            setattr(self, 'bias_hh_l{}'.format(layer), b_hh)
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        stdv = 1.0 / self.hidden_size ** 0.5
+        for weight in self.parameters():
+            weight.data.uniform_(-stdv, stdv)
+
+    def _layer_params(self, layer):
+        return [getattr(self, '{}_l{}'.format(name, layer)) for name in
+                ('weight_ih', 'weight_hh', 'bias_ih', 'bias_hh')]
+
+    def forward(self, input, hidden):
+        h0, c0 = hidden
+        output = input
+        hs, cs = [], []
+        for layer in range(self.num_layers):
+            if layer > 0:
+                output = nn.functional.dropout(
+                    output, p=self.dropout, training=self.training)
+            output, h, c = lstm_loop(
+                output, h0[layer], c0[layer], *self._layer_params(layer))
+            hs.append(h)
+            cs.append(c)
+        return output, (torch.stack(hs), torch.stack(cs))
+
 
 class RNNModel(nn.Module):
     """Container module with an encoder, a recurrent module, and a decoder."""
@@ -10,12 +94,14 @@ class RNNModel(nn.Module):
         self.encoder = nn.Embedding(ntoken, ninp)
         if rnn_type in ['LSTM', 'GRU']:
             self.rnn = getattr(nn, rnn_type)(ninp, nhid, nlayers, dropout=dropout)
+        elif rnn_type == 'JIT_LSTM':
+            self.rnn = ScriptLSTM(ninp, nhid, nlayers, dropout=dropout)
         else:
             try:
                 nonlinearity = {'RNN_TANH': 'tanh', 'RNN_RELU': 'relu'}[rnn_type]
             except KeyError:
                 raise ValueError( """An invalid option for `--model` was supplied,
-                                 options are ['LSTM', 'GRU', 'RNN_TANH' or 'RNN_RELU']""")
+                                 options are ['LSTM', 'JIT_LSTM', 'GRU', 'RNN_TANH' or 'RNN_RELU']""")
             self.rnn = nn.RNN(ninp, nhid, nlayers, nonlinearity=nonlinearity, dropout=dropout)
         self.decoder = nn.Linear(nhid, ntoken)
 
@@ -43,16 +129,147 @@ class RNNModel(nn.Module):
         self.decoder.weight.data.uniform_(-initrange, initrange)
 
     def forward(self, input, hidden):
+        # input is time-major, (bptt, batch); the whole window is
+        # passed to the recurrent layer at once so that the built-in
+        # torch RNNs run it as a single fused cuDNN call.
         emb = self.drop(self.encoder(input))
+        if isinstance(self.rnn, nn.RNNBase):
+            # make sure cuDNN gets one contiguous weight buffer
+            self.rnn.flatten_parameters()
         output, hidden = self.rnn(emb, hidden)
         output = self.drop(output)
-        decoded = self.decoder(output.view(output.size(0)*output.size(1), output.size(2)))
+        decoded = self.decoder(output.view(-1, self.nhid))
         return decoded.view(output.size(0), output.size(1), decoded.size(1)), hidden
 
     def init_hidden(self, bsz):
-        weight = next(self.parameters()).data
-        if self.rnn_type == 'LSTM':
-            return (Variable(weight.new(self.nlayers, bsz, self.nhid).zero_()),
-                    Variable(weight.new(self.nlayers, bsz, self.nhid).zero_()))
+        weight = next(self.parameters())
+        if self.rnn_type in ['LSTM', 'JIT_LSTM']:
+            return (weight.new_zeros(self.nlayers, bsz, self.nhid),
+                    weight.new_zeros(self.nlayers, bsz, self.nhid))
         else:
-            return Variable(weight.new(self.nlayers, bsz, self.nhid).zero_())
+            return weight.new_zeros(self.nlayers, bsz, self.nhid)
+
+
+class BatchedRNNModel(nn.Module):
+    """Several independent LSTM language models that are trained as one.
+
+    The ``n_models`` models are packed into one embedding, one
+    ``nn.LSTM`` and one batched decoder, so that each step runs a
+    single (cuDNN) kernel sequence for all of them instead of one per
+    model. The hidden units of model ``k`` are the ``k``-th slice of
+    each LSTM gate. The input and recurrent LSTM weights are kept block
+    diagonal by masking them (and their gradients, see
+    ``mask_grads``), so the models don't influence each other. This
+    wastes the FLOPs of the zero blocks, which pays off when the models
+    are small and training is dominated by kernel launch overhead.
+
+    The output has shape ``(bptt, batch, n_models, ntoken)``.
+
+    """
+    def __init__(self, n_models, ntoken, ninp, nhid, nlayers, dropout=0.5):
+        super(BatchedRNNModel, self).__init__()
+        self.n_models = n_models
+        self.ntoken = ntoken
+        self.ninp = ninp
+        self.nhid = nhid
+        self.nlayers = nlayers
+        self.dropout = dropout
+
+        self.drop = nn.Dropout(dropout)
+        self.encoder = nn.Embedding(ntoken, n_models * ninp)
+        self.rnn = nn.LSTM(n_models * ninp, n_models * nhid, nlayers, dropout=dropout)
+        self.decoder_weight = nn.Parameter(torch.Tensor(n_models, ntoken, nhid))
+        self.decoder_bias = nn.Parameter(torch.Tensor(n_models, ntoken))
+
+        for layer in range(nlayers):
+            layer_ninp = ninp if layer == 0 else nhid
+            self.register_buffer(
+                'mask_ih_l{}'.format(layer), self._block_mask(layer_ninp))
+            self.register_buffer('mask_hh_l{}'.format(layer), self._block_mask(nhid))
+
+        self.init_weights()
+
+    def _block_mask(self, ncol):
+        """Mask of shape (4 * n_models * nhid, n_models * ncol) that
+        connects the gates of each model only to its own inputs."""
+        n, nhid = self.n_models, self.nhid
+        mask = torch.eye(n).view(1, n, 1, n, 1).expand(4, n, nhid, n, ncol)
+        return mask.reshape(4 * n * nhid, n * ncol)
+
+    def _masks(self):
+        for layer in range(self.nlayers):
+            for kind in ('ih', 'hh'):
+                yield (getattr(self.rnn, 'weight_{}_l{}'.format(kind, layer)),
+                       getattr(self, 'mask_{}_l{}'.format(kind, layer)))
+
+    def init_weights(self):
+        initrange = 0.1
+        self.encoder.weight.data.uniform_(-initrange, initrange)
+        self.decoder_bias.data.fill_(0)
+        self.decoder_weight.data.uniform_(-initrange, initrange)
+
+        # same initialization as an nn.LSTM with nhid hidden units
+        stdv = 1.0 / self.nhid ** 0.5
+        for weight in self.rnn.parameters():
+            weight.data.uniform_(-stdv, stdv)
+        for weight, mask in self._masks():
+            weight.data.mul_(mask)
+
+    def mask_grads(self):
+        """Zero the gradients of the off-diagonal LSTM weight blocks.
+
+        Call this after ``backward`` and before updating the weights.
+
+        """
+        for weight, mask in self._masks():
+            if weight.grad is not None:
+                weight.grad.mul_(mask)
+
+    def model_view(self, name, x):
+        """View ``x``, the parameter called ``name`` or its gradient,
+        such that dimension 1 indexes the models."""
+        if name.startswith('encoder'):
+            return x.view(x.size(0), self.n_models, -1)
+        if name.startswith('rnn'):
+            return x.view(4, self.n_models, -1)
+        return x.view(1, self.n_models, -1)
+
+    def forward(self, input, hidden):
+        emb = self.drop(self.encoder(input))
+        self.rnn.flatten_parameters()
+        output, hidden = self.rnn(emb, hidden)
+        output = self.drop(output)
+
+        seq_len, bsz = output.size(0), output.size(1)
+        # (seq_len * bsz, n_models, nhid) -> (n_models, seq_len * bsz, nhid)
+        output = output.view(-1, self.n_models, self.nhid).transpose(0, 1)
+        decoded = torch.baddbmm(
+            self.decoder_bias.unsqueeze(1), output, self.decoder_weight.transpose(1, 2))
+        decoded = decoded.transpose(0, 1).contiguous()
+        return decoded.view(seq_len, bsz, self.n_models, self.ntoken), hidden
+
+    def init_hidden(self, bsz):
+        weight = next(self.parameters())
+        return (weight.new_zeros(self.nlayers, bsz, self.n_models * self.nhid),
+                weight.new_zeros(self.nlayers, bsz, self.n_models * self.nhid))
+
+    def extract(self, k):
+        """Return the ``k``-th model as a stand-alone ``RNNModel``."""
+        model = RNNModel('LSTM', self.ntoken, self.ninp, self.nhid,
+                         self.nlayers, dropout=self.dropout)
+        n, nhid = self.n_models, self.nhid
+        state = {
+            'encoder.weight': self.encoder.weight.view(self.ntoken, n, -1)[:, k],
+            'decoder.weight': self.decoder_weight[k],
+            'decoder.bias': self.decoder_bias[k],
+        }
+        for layer in range(self.nlayers):
+            for kind in ('ih', 'hh'):
+                key = 'weight_{}_l{}'.format(kind, layer)
+                weight = getattr(self.rnn, key).view(4, n, nhid, n, -1)
+                state['rnn.' + key] = weight[:, k, :, k].reshape(4 * nhid, -1)
+                key = 'bias_{}_l{}'.format(kind, layer)
+                bias = getattr(self.rnn, key).view(4, n, nhid)
+                state['rnn.' + key] = bias[:, k].reshape(-1)
+        model.load_state_dict({key: val.detach().clone() for key, val in state.items()})
+        return model
@@ -1,11 +1,40 @@
+import warnings
+
 import skorch
 import numpy as np
 import torch
-from torch.autograd import Variable
 from sklearn.metrics import f1_score
 
 
+def map_hidden(fn, *hs):
+    """Apply ``fn`` to the tensors of (nested tuples of) hidden states."""
+    if isinstance(hs[0], torch.Tensor):
+        return fn(*hs)
+    return tuple(map_hidden(fn, *h) for h in zip(*hs))
+
+
 class Net(skorch.NeuralNet):
+    """Net for the word language model.
+
+    If ``cuda_graph`` is True and the data is on a CUDA device, the
+    whole training step (forward, backward, gradient clipping and the
+    SGD update) is captured once in a CUDA graph and replayed for every
+    following batch of the same shape, which saves the launch overhead
+    of the many small kernels of the RNN. The first ``cuda_graph_warmup``
+    steps run eagerly before the capture. Batches of a different shape
+    (the shorter last window of an epoch) are run eagerly. Validation is
+    never captured.
+
+    If ``compile`` is True and the net runs on CUDA, the module is
+    compiled with ``torch.compile`` (``mode='reduce-overhead'``), which
+    uses CUDA graphs itself, so it can't be combined with ``cuda_graph``.
+    TorchDynamo does not trace into the recurrent layer (neither the
+    built-in RNN modules nor the TorchScript ``JIT_LSTM``), so the RNN
+    still runs eagerly; only the embedding, dropout and decoder are
+    compiled. This requires PyTorch 2.2 or newer; otherwise, or when not
+    running on CUDA, ``compile`` is ignored with a warning.
+
+    """
 
     def __init__(
             self,
@@ -13,17 +42,59 @@ class Net(skorch.NeuralNet):
             clip=0.25,
             lr=20,
             ntokens=10000,
+            cuda_graph=False,
+            cuda_graph_warmup=3,
+            compile=False,
             *args,
             **kwargs
     ):
         self.clip = clip
         self.ntokens = ntokens
+        self.cuda_graph = cuda_graph
+        self.cuda_graph_warmup = cuda_graph_warmup
+        self.compile = compile
         super(Net, self).__init__(criterion=criterion, lr=lr, *args, **kwargs)
 
+    def initialize_module(self):
+        # A captured graph refers to the parameters of the module it was
+        # captured with, so it cannot be reused for a new module.
+        self.cuda_graph_ = None
+        super().initialize_module()
+
+        if self.cuda_graph and not str(self.device).startswith('cuda'):
+            warnings.warn(
+                "cuda_graph=True is ignored since the net does not run on "
+                "CUDA (device={!r}).".format(self.device))
+        if self.compile:
+            self.compile_module()
+        return self
+
+    def compile_module(self):
+        if not str(self.device).startswith('cuda'):
+            warnings.warn(
+                "compile=True is ignored since the net does not run on "
+                "CUDA (device={!r}).".format(self.device))
+            return
+        if not hasattr(torch.nn.Module, 'compile'):
+            warnings.warn(
+                "compile=True is ignored since it requires PyTorch 2.2 or "
+                "newer (found {}).".format(torch.__version__))
+            return
+
+        if self.cuda_graph:
+            raise ValueError(
+                "cuda_graph=True can't be combined with compile=True, "
+                "the compiled module already uses CUDA graphs.")
+        # Unlike torch.compile(module), compiling in place keeps the
+        # parameter names, so saved params can still be loaded into
+        # an RNNModel. bptt and batch size are fixed, so there is no
+        # need for dynamic shapes.
+        self.module_.compile(mode='reduce-overhead', dynamic=False)
+
     def repackage_hidden(self, h):
-        """Wraps hidden states in new Variables, to detach them from their history."""
-        if isinstance(h, Variable):
-            return torch.tensor(h.data, device=h.device)
+        """Detach hidden states from their history without copying them."""
+        if isinstance(h, torch.Tensor):
+            return h.detach()
         else:
             return tuple(self.repackage_hidden(v) for v in h)
 
@@ -35,12 +106,19 @@ class Net(skorch.NeuralNet):
         # This optimization was taken from the original example.
         self.hidden = self.module_.init_hidden(self.batch_size)
 
-    def train_step(self, X, y):
+    def train_step(self, batch, **fit_params):
         self.module_.train()
+        X, y = skorch.dataset.unpack_data(batch)
 
         # Repackage shared hidden state so that the previous batch
         # does not influence the current one.
         self.hidden = self.repackage_hidden(self.hidden)
+
+        if self.cuda_graph and X.is_cuda:
+            return self.train_step_graphed(X, y)
+        return self.train_step_eager(X, y)
+
+    def train_step_eager(self, X, y):
         self.module_.zero_grad()
 
         output, self.hidden = self.module_(X, self.hidden)
@@ -51,43 +129,118 @@ class Net(skorch.NeuralNet):
 
         torch.nn.utils.clip_grad_norm_(self.module_.parameters(), self.clip)
         for p in self.module_.parameters():
-            p.data.add_(-self.lr, p.grad.data)
+            p.data.add_(p.grad, alpha=-self.lr)
         return {'loss': loss, 'y_pred': y_pred}
 
-    def validation_step(self, X, y):
+    def train_step_graphed(self, X, y):
+        graph = self.cuda_graph_
+        if graph is None:
+            graph = self.cuda_graph_ = {'shape': X.shape, 'steps': 0}
+        if X.shape != graph['shape']:
+            return self.train_step_eager(X, y)
+
+        if graph['steps'] < self.cuda_graph_warmup:
+            # Warm up on a side stream, as required before capturing.
+            graph['steps'] += 1
+            stream = torch.cuda.Stream()
+            stream.wait_stream(torch.cuda.current_stream())
+            with torch.cuda.stream(stream):
+                step = self.train_step_eager(X, y)
+            torch.cuda.current_stream().wait_stream(stream)
+            return step
+
+        if 'graph' not in graph:
+            self.capture_train_step(graph, X, y)
+
+        # Capturing does not run the step, so the replay is needed
+        # for the capturing batch as well.
+        graph['X'].copy_(X, non_blocking=True)
+        graph['y'].copy_(y, non_blocking=True)
+        map_hidden(torch.Tensor.copy_, graph['hidden'], self.hidden)
+        # The learning rate is an input of the graph since it may be
+        # changed between steps (see LRAnnealing).
+        graph['lr'].fill_(self.lr)
+        graph['graph'].replay()
+
+        # The outputs are overwritten by the next replay. The hidden
+        # state is only used by that replay, but the loss and the
+        # prediction may be kept by callbacks (e.g. for caching), so
+        # they are copied.
+        self.hidden = graph['hidden_out']
+        return {'loss': graph['loss'].clone(), 'y_pred': graph['y_pred'].clone()}
+
+    def capture_train_step(self, graph, X, y):
+        graph['X'] = X.clone()
+        graph['y'] = y.clone()
+        graph['hidden'] = map_hidden(torch.clone, self.hidden)
+        graph['lr'] = torch.zeros((), device=X.device)
+
+        # Gradients are allocated inside of the graph's memory pool.
+        self.module_.zero_grad(set_to_none=True)
+        graph['graph'] = torch.cuda.CUDAGraph()
+        with torch.cuda.graph(graph['graph']):
+            output, hidden = self.module_(graph['X'], graph['hidden'])
+            y_pred = output.view(-1, self.ntokens)
+
+            loss = self.get_loss(y_pred, graph['y'])
+            loss.backward()
+
+            torch.nn.utils.clip_grad_norm_(self.module_.parameters(), self.clip)
+            for p in self.module_.parameters():
+                p.data.sub_(p.grad * graph['lr'])
+
+        graph['hidden_out'] = self.repackage_hidden(hidden)
+        graph['loss'] = loss.detach()
+        graph['y_pred'] = y_pred.detach()
+
+    def validation_step(self, batch, **fit_params):
         self.module_.eval()
+        X, y = skorch.dataset.unpack_data(batch)
 
-        hidden = self.module_.init_hidden(self.batch_size)
-        output, _ = self.module_(X, hidden)
-        output_flat = output.view(-1, self.ntokens)
+        with torch.no_grad():
+            hidden = self.module_.init_hidden(self.batch_size)
+            output, _ = self.module_(X, hidden)
+            output_flat = output.view(-1, self.ntokens)
 
         return {'loss': self.get_loss(output_flat, y), 'y_pred': output_flat}
 
-    def evaluation_step(self, X, **kwargs):
-        self.module_.eval()
+    def evaluation_step(self, batch, training=False):
+        self.module_.train(training)
+        X, _ = skorch.dataset.unpack_data(batch)
 
         X = skorch.utils.to_tensor(X, device=self.device)
-        hidden = self.module_.init_hidden(self.batch_size)
-        output, _ = self.module_(X, hidden)
+        with torch.set_grad_enabled(training):
+            hidden = self.module_.init_hidden(self.batch_size)
+            output, _ = self.module_(X, hidden)
 
         return output.view(-1, self.ntokens)
 
     def predict(self, X):
         return np.argmax(super().predict(X), -1)
 
-    def sample(self, input, temperature=1., hidden=None):
-        hidden = self.module_.init_hidden(1) if hidden is None else hidden
-        output, hidden = self.module_(input, hidden)
+    def __getstate__(self):
+        state = super().__getstate__()
+        # A CUDA graph cannot be pickled, it is captured again instead.
+        if 'cuda_graph_' in state:
+            state['cuda_graph_'] = None
+        return state
+
+    def sample(self, input, temperature=1., hidden=None, module=None):
+        module = self.module_ if module is None else module
+        hidden = module.init_hidden(1) if hidden is None else hidden
+        output, hidden = module(input, hidden)
         probas = output.squeeze().data.div(temperature).exp()
         sample = torch.multinomial(probas, 1)[-1]
         if probas.dim() > 1:
             sample = sample[0]
         return sample, self.repackage_hidden(hidden)
 
-    def sample_n(self, num_words, input, temperature=1., hidden=None):
+    def sample_n(self, num_words, input, temperature=1., hidden=None, module=None):
+        """Sample ``num_words`` words, by default from ``module_``. Pass
+        ``module`` to sample from another (e.g. quantized) copy."""
         preds = [None] * num_words
         for i in range(num_words):
-            preds[i], hidden = self.sample(input, hidden=hidden)
+            preds[i], hidden = self.sample(input, hidden=hidden, module=module)
             input = skorch.utils.to_tensor(torch.LongTensor([[preds[i]]]),
                                            device=self.device)
         return preds, hidden
@@ -100,3 +253,83 @@ class Net(skorch.NeuralNet):
         y_pred = self.predict(X)
 
         return f1_score(y_true, y_pred, average='micro')
+
+
+class BatchedNet(Net):
+    """Train one model per learning rate in ``lrs`` at the same time.
+
+    Use this with ``model.BatchedRNNModel`` (``module__n_models`` must
+    be ``len(lrs)``). Each model gets its own learning rate (in
+    ``lrs_``, which may be changed during training) and its own
+    gradient clipping, exactly as if it was trained by ``Net``. The
+    per-model losses are recorded in the history as ``train_loss_k``
+    and ``valid_loss_k`` on the batch level; add a
+    ``PassthroughScoring`` callback per name to get epoch averages.
+    ``train_loss``/``valid_loss`` are the mean over all models.
+
+    """
+    def __init__(self, lrs=(10, 20, 30), *args, **kwargs):
+        self.lrs = lrs
+        super(BatchedNet, self).__init__(*args, **kwargs)
+
+    def initialize(self):
+        super().initialize()
+        self.lrs_ = list(self.lrs)
+        return self
+
+    def get_losses(self, output, y):
+        """Return the loss of each model, output has shape (bptt,
+        batch, n_models, ntokens)."""
+        n_models = output.size(2)
+        y = skorch.utils.to_tensor(y, device=self.device)
+        target = y.view(-1, 1).expand(-1, n_models).reshape(-1)
+        losses = torch.nn.functional.cross_entropy(
+            output.view(-1, self.ntokens), target, reduction='none')
+        return losses.view(-1, n_models).mean(0)
+
+    def record_losses(self, prefix, losses):
+        for k, loss in enumerate(losses.tolist()):
+            self.history.record_batch('{}_loss_{}'.format(prefix, k), loss)
+
+    def update_params(self):
+        """SGD step with per-model gradient clipping and learning rate."""
+        named_params = list(self.module_.named_parameters())
+        model_view = self.module_.model_view
+
+        sq_norms = sum(model_view(name, p.grad).pow(2).sum((0, 2))
+                       for name, p in named_params)
+        clip_coefs = (self.clip / (sq_norms.sqrt() + 1e-6)).clamp(max=1.0)
+        lrs = torch.as_tensor(self.lrs_, dtype=sq_norms.dtype, device=sq_norms.device)
+        steps = (-lrs * clip_coefs).view(1, -1, 1)
+
+        for name, p in named_params:
+            model_view(name, p.data).add_(model_view(name, p.grad) * steps)
+
+    def train_step(self, batch, **fit_params):
+        self.module_.train()
+        X, y = skorch.dataset.unpack_data(batch)
+
+        self.hidden = self.repackage_hidden(self.hidden)
+        self.module_.zero_grad()
+
+        output, self.hidden = self.module_(X, self.hidden)
+        losses = self.get_losses(output, y)
+        losses.sum().backward()
+
+        self.module_.mask_grads()
+        self.update_params()
+
+        self.record_losses('train', losses)
+        return {'loss': losses.mean(), 'y_pred': output}
+
+    def validation_step(self, batch, **fit_params):
+        self.module_.eval()
+        X, y = skorch.dataset.unpack_data(batch)
+
+        with torch.no_grad():
+            hidden = self.module_.init_hidden(self.batch_size)
+            output, _ = self.module_(X, hidden)
+            losses = self.get_losses(output, y)
+
+        self.record_losses('valid', losses)
+        return {'loss': losses.mean(), 'y_pred': output}
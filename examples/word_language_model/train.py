@@ -1,16 +1,23 @@
 import argparse
+import multiprocessing
 
+from joblib import parallel_backend
+import numpy as np
 import skorch
 import torch
 from sklearn.model_selection import GridSearchCV
 
 import data
+from model import BatchedRNNModel
 from model import RNNModel
+from net import BatchedNet
 from net import Net
 
 parser = argparse.ArgumentParser(description='PyTorch PennTreeBank RNN/LSTM Language Model')
 parser.add_argument('--data', type=str, default='./data/penn',
                     help='location of the data corpus')
+parser.add_argument('--model', type=str, default='LSTM',
+                    help='type of recurrent net (RNN_TANH, RNN_RELU, LSTM, JIT_LSTM, GRU)')
 parser.add_argument('--bptt', type=int, default=35,
                     help='sequence length')
 parser.add_argument('--batch_size', type=int, default=20, metavar='N',
@@ -23,88 +30,213 @@ parser.add_argument('--seed', type=int, default=1111,
                     help='random seed')
 parser.add_argument('--no-cuda', dest='cuda', action='store_false',
                     help='use CUDA')
+parser.add_argument('--cuda-graph', action='store_true',
+                    help='capture the training step in a CUDA graph and replay it')
+parser.add_argument('--compile', action='store_true',
+                    help='compile the model with torch.compile (CUDA only)')
+parser.add_argument('--quantize', action='store_true',
+                    help='sample the example sentences from an int8 quantized '
+                         'copy of the model (CPU only)')
+parser.add_argument('--n-jobs', type=int, default=3,
+                    help='number of grid search fits to run in parallel')
+parser.add_argument('--batched', action='store_true',
+                    help='train one model per learning rate as a single batched '
+                         'model instead of running a grid search')
 parser.add_argument('--save', type=str,  default='model.pt',
                     help='path to save the final model')
-args = parser.parse_args()
 
-torch.manual_seed(args.seed)
-
-corpus = data.Corpus(args.data)
-ntokens = len(corpus.dictionary)
-device = 'cuda' if args.cuda else 'cpu'
 
 class LRAnnealing(skorch.callbacks.Callback):
     def on_epoch_end(self, net, **kwargs):
         if not net.history[-1]['valid_loss_best']:
             net.lr /= 4.0
 
-class ExamplePrinter(skorch.callbacks.Callback):
+class BatchedLRAnnealing(skorch.callbacks.Callback):
     def on_epoch_end(self, net, **kwargs):
-        seed_sentence = "the meaning of"
-        indices = [corpus.dictionary.word2idx[n] for n in seed_sentence.split()]
-        indices = skorch.utils.to_tensor(
+        for k in range(len(net.lrs_)):
+            if not net.history[-1]['valid_loss_{}_best'.format(k)]:
+                net.lrs_[k] /= 4.0
+
+class ExamplePrinter(skorch.callbacks.Callback):
+    """Print a sentence sampled from the net after every epoch.
+
+    If ``quantize`` is True, the words are sampled from an int8
+    dynamically quantized copy of the module. This is only supported on
+    CPU. The copy is made anew every epoch since the weights change, so
+    this only pays off for long samples.
+
+    """
+    seed_sentence = "the meaning of"
+
+    def __init__(self, quantize=False):
+        self.quantize = quantize
+
+    def initialize(self):
+        # The seed doesn't change between epochs, so look up the words
+        # and move the input to the device only once.
+        indices = [corpus.dictionary.word2idx[n] for n in self.seed_sentence.split()]
+        self.indices_ = skorch.utils.to_tensor(
             torch.LongTensor([indices]).t(), device=device)
-        sentence, _ = net.sample_n(num_words=10, input=indices)
-        print(seed_sentence,
+        return self
+
+    def on_epoch_end(self, net, **kwargs):
+        module = None
+        if self.quantize and net.device == 'cpu':
+            # The weights change every epoch, so quantize them anew.
+            module = torch.quantization.quantize_dynamic(
+                net.module_, {torch.nn.Linear, torch.nn.LSTM}, dtype=torch.qint8)
+        sentence, _ = net.sample_n(num_words=10, input=self.indices_, module=module)
+        print(self.seed_sentence,
               " ".join([corpus.dictionary.idx2word[n] for n in sentence]))
 
 
-def my_train_split(ds, y):
+def init_worker(counter, lock):
+    """Pin a grid search worker process to one of the visible GPUs.
+
+    Every worker draws the next index from the shared counter, so the
+    workers are assigned to the GPUs in turn.
+
+    """
+    with lock:
+        worker_id = counter.value
+        counter.value += 1
+    torch.cuda.set_device(worker_id % torch.cuda.device_count())
+
+
+def my_train_split(ds, y=None):
     # Return (corpus.train, corpus.valid) in case the network
     # is fitted using net.fit(corpus.train).
     return ds, skorch.dataset.Dataset(corpus.valid[:200], y=None)
 
-net = Net(
-    module=RNNModel,
-    max_epochs=args.epochs,
-    batch_size=args.batch_size,
-    device=device,
-    callbacks=[
-        skorch.callbacks.Checkpoint(),
-        skorch.callbacks.ProgressBar(),
-        LRAnnealing(),
-        ExamplePrinter()
-    ],
-    module__rnn_type='LSTM',
-    module__ntoken=ntokens,
-    module__ninp=200,
-    module__nhid=200,
-    module__nlayers=2,
-
-    # Use (corpus.train, corpus.valid) as validation split.
-    # Even though we are doing a grid search, we use an internal
-    # validation set to determine when to save (Checkpoint callback)
-    # and when to decrease the learning rate (LRAnnealing callback).
-    train_split=my_train_split,
-
-    # To demonstrate that skorch is able to use already available
-    # data loaders as well, we use the data loader from the word
-    # language model.
-    iterator_train=data.Loader,
-    iterator_train__device=device,
-    iterator_train__bptt=args.bptt,
-    iterator_valid=data.Loader,
-    iterator_valid__device=device,
-    iterator_valid__bptt=args.bptt)
-
-
-# Demonstrate the use of grid search by testing different learning
-# rates while saving the best model at the end.
-
-params = [
-    {
-        'lr': [10,20,30],
-    },
-]
-
-pl = GridSearchCV(net, params)
-
-pl.fit(corpus.train[:args.data_limit].numpy())
-
-print("Results of grid search:")
-print("Best parameter configuration:", pl.best_params_)
-print("Achieved F1 score:", pl.best_score_)
-
-print("Saving best model to '{}'.".format(args.save))
-pl.best_estimator_.save_params(f_params=args.save)
 
+def grid_search(lrs):
+    net = Net(
+        module=RNNModel,
+        max_epochs=args.epochs,
+        batch_size=args.batch_size,
+        device=device,
+        callbacks=[
+            skorch.callbacks.Checkpoint(),
+            skorch.callbacks.ProgressBar(),
+            LRAnnealing(),
+            ExamplePrinter(quantize=args.quantize)
+        ],
+        cuda_graph=args.cuda_graph,
+        compile=args.compile,
+        module__rnn_type=args.model,
+        module__ntoken=ntokens,
+        module__ninp=200,
+        module__nhid=200,
+        module__nlayers=2,
+
+        # Use (corpus.train, corpus.valid) as validation split.
+        # Even though we are doing a grid search, we use an internal
+        # validation set to determine when to save (Checkpoint callback)
+        # and when to decrease the learning rate (LRAnnealing callback).
+        train_split=my_train_split,
+
+        # To demonstrate that skorch is able to use already available
+        # data loaders as well, we use the data loader from the word
+        # language model.
+        iterator_train=data.Loader,
+        iterator_train__device=device,
+        iterator_train__bptt=args.bptt,
+        iterator_valid=data.Loader,
+        iterator_valid__device=device,
+        iterator_valid__bptt=args.bptt)
+
+    # Demonstrate the use of grid search by testing different learning
+    # rates while saving the best model at the end.
+
+    params = [
+        {
+            'lr': lrs,
+        },
+    ]
+
+    # The fits are independent of each other, so they can be run in
+    # parallel worker processes. With CUDA, each worker is pinned to one
+    # of the visible GPUs when it starts (see init_worker).
+    pl = GridSearchCV(net, params, cv=3, n_jobs=args.n_jobs, pre_dispatch='n_jobs')
+
+    backend_kwargs = {}
+    if device == 'cuda' and torch.cuda.device_count() > 1:
+        manager = multiprocessing.Manager()
+        backend_kwargs = {
+            'initializer': init_worker,
+            'initargs': (manager.Value('i', 0), manager.Lock()),
+        }
+
+    with parallel_backend('loky', **backend_kwargs):
+        pl.fit(corpus.train[:args.data_limit].numpy())
+
+    print("Results of grid search:")
+    print("Best parameter configuration:", pl.best_params_)
+    print("Achieved F1 score:", pl.best_score_)
+
+    print("Saving best model to '{}'.".format(args.save))
+    pl.best_estimator_.save_params(f_params=args.save)
+
+
+def train_batched(lrs):
+    # Instead of fitting one net per learning rate, train all of them
+    # at once, packed into a single model (see BatchedRNNModel). The
+    # loss of each model is tracked separately in the history.
+    names = ['{}_loss_{}'.format(prefix, k)
+             for k in range(len(lrs)) for prefix in ('train', 'valid')]
+    scorings = [
+        (name, skorch.callbacks.PassthroughScoring(
+            name=name, on_train=name.startswith('train')))
+        for name in names
+    ]
+
+    net = BatchedNet(
+        lrs=lrs,
+        module=BatchedRNNModel,
+        max_epochs=args.epochs,
+        batch_size=args.batch_size,
+        device=device,
+        callbacks=scorings + [
+            ('progress_bar', skorch.callbacks.ProgressBar()),
+            ('lr_annealing', BatchedLRAnnealing()),
+        ],
+        module__n_models=len(lrs),
+        module__ntoken=ntokens,
+        module__ninp=200,
+        module__nhid=200,
+        module__nlayers=2,
+        train_split=my_train_split,
+        iterator_train=data.Loader,
+        iterator_train__device=device,
+        iterator_train__bptt=args.bptt,
+        iterator_valid=data.Loader,
+        iterator_valid__device=device,
+        iterator_valid__bptt=args.bptt)
+
+    net.fit(corpus.train[:args.data_limit].numpy())
+
+    valid_losses = [min(net.history[:, 'valid_loss_{}'.format(k)])
+                    for k in range(len(lrs))]
+    best = int(np.argmin(valid_losses))
+    print("Results of batched training:")
+    print("Best learning rate:", lrs[best])
+    print("Achieved validation loss:", valid_losses[best])
+
+    print("Saving best model to '{}'.".format(args.save))
+    torch.save(net.module_.extract(best).state_dict(), args.save)
+
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+
+    corpus = data.Corpus(args.data)
+    ntokens = len(corpus.dictionary)
+    device = 'cuda' if args.cuda else 'cpu'
+
+    lrs = [10, 20, 30]
+    if args.batched:
+        train_batched(lrs)
+    else:
+        grid_search(lrs)
@@ -9,6 +9,7 @@ import warnings
 import numpy as np
 import sklearn
 from sklearn.metrics import make_scorer, check_scoring
+import torch
 
 if LooseVersion(sklearn.__version__) >= '0.22':
     from sklearn.metrics._scorer import _BaseScorer
@@ -115,6 +116,12 @@ class ScoringBase(Callback):
     """Base class for scoring.
 
     Subclass and implement an ``on_*`` method before using.
+
+    ``scoring`` and ``name`` are resolved only once, when the callback
+    is initialized, and the results are stored in ``scoring_`` and
+    ``name_``. If you change these attributes directly afterwards,
+    call ``initialize`` again.
+
     """
     def __init__(
             self,
@@ -157,9 +164,19 @@ class ScoringBase(Callback):
     def initialize(self):
         self.best_score_ = np.inf if self.lower_is_better else -np.inf
         self.scoring_ = convert_sklearn_metric_function(self.scoring)
+        self.scorer_ = None
         self.name_ = self._get_name()
         return self
 
+    def set_params(self, **params):
+        super().set_params(**params)
+        if {'scoring', 'name'} & set(params) and hasattr(self, 'scoring_'):
+            # don't keep using a scorer or name resolved from the old
+            # scoring
+            self.scoring_ = convert_sklearn_metric_function(self.scoring)
+            self.scorer_ = None
+            self.name_ = self._get_name()
+
     # pylint: disable=attribute-defined-outside-init,arguments-differ
     def on_train_begin(self, net, X, y, **kwargs):
         self.X_indexing_ = check_indexing(X)
@@ -175,9 +192,15 @@ class ScoringBase(Callback):
 
     def _scoring(self, net, X_test, y_test):
         """Resolve scoring and apply it to data. Use cached prediction
-        instead of running inference again, if available."""
-        scorer = check_scoring(net, self.scoring_)
-        return scorer(net, X_test, y_test)
+        instead of running inference again, if available.
+
+        The scorer is only resolved once and re-used afterwards, since
+        this method may be called for each batch.
+
+        """
+        if self.scorer_ is None:
+            self.scorer_ = check_scoring(net, self.scoring_)
+        return self.scorer_(net, X_test, y_test)
 
     def _is_best_score(self, current_score):
         if self.lower_is_better is None:
@@ -229,7 +252,10 @@ class BatchScoring(ScoringBase):
       ``scoring`` argument.
 
     target_extractor : callable (default=to_numpy)
-      This is called on y before it is passed to scoring.
+      This is called on y before it is passed to scoring. If your
+      scoring function works with torch tensors, decorate it with
+      :func:`skorch.scoring.tensor_scorer` to skip this step, so that
+      y doesn't need to be moved to CPU for each batch.
 
     use_caching : bool (default=True)
       Re-use the model's prediction for computing the loss to calculate
@@ -237,6 +263,22 @@ class BatchScoring(ScoringBase):
       step for each batch.
 
     """
+    def initialize(self):
+        super().initialize()
+        self._initialize_sums()
+        return self
+
+    def _initialize_sums(self):
+        # Running sums of the batch scores weighted by batch size, so
+        # that the epoch average doesn't require a pass over the
+        # history.
+        self.weighted_score_sum_ = 0.0
+        self.batch_size_sum_ = 0
+
+    # pylint: disable=unused-argument,arguments-differ
+    def on_epoch_begin(self, net, **kwargs):
+        self._initialize_sums()
+
     # pylint: disable=unused-argument,arguments-differ
 
     def on_batch_end(self, net, batch, training, **kwargs):
@@ -248,33 +290,54 @@ class BatchScoring(ScoringBase):
         with _cache_net_forward_iter(net, self.use_caching, y_preds) as cached_net:
             # In case of y=None we will not have gathered any samples.
             # We expect the scoring function to deal with y=None.
-            y = None if y is None else self.target_extractor(y)
+            if y is not None and not self._accepts_tensor():
+                y = self.target_extractor(y)
             try:
                 score = self._scoring(cached_net, X, y)
                 cached_net.history.record_batch(self.name_, score)
             except KeyError:
-                pass
+                return
 
-    def get_avg_score(self, history):
-        if self.on_train:
-            bs_key = 'train_batch_size'
-        else:
-            bs_key = 'valid_batch_size'
+        # as in get_avg_score, ignore batches without a batch size
+        batch_size = net.history[-1]['batches'][-1].get(self._batch_size_key())
+        if batch_size is None:
+            return
+        self.weighted_score_sum_ += batch_size * float(score)
+        self.batch_size_sum_ += batch_size
+
+    def _accepts_tensor(self):
+        """Whether the scoring function can deal with y as it is, see
+        :func:`skorch.scoring.tensor_scorer`."""
+        return getattr(self.scoring_, 'accepts_tensor', False)
+
+    def _batch_size_key(self):
+        return 'train_batch_size' if self.on_train else 'valid_batch_size'
 
-        weights, scores = list(zip(
-            *history[-1, 'batches', :, [bs_key, self.name_]]))
-        score_avg = np.average(scores, weights=weights)
+    def get_avg_score(self, history):
+        """Return the average of the batch scores of the last epoch
+        in ``history``, weighted by batch size."""
+        bs_key = self._batch_size_key()
+
+        # one array of (batch size, score) rows instead of two tuples
+        rows = history[-1, 'batches', :, [bs_key, self.name_]]
+        weights_scores = np.asarray(rows, dtype=np.float64)
+        score_avg = np.average(weights_scores[:, 1], weights=weights_scores[:, 0])
         return score_avg
 
     # pylint: disable=unused-argument
     def on_epoch_end(self, net, **kwargs):
         history = net.history
-        try:  # don't raise if there is no valid data
-            history[-1, 'batches', :, self.name_]
-        except KeyError:
-            return
+        if self.batch_size_sum_:
+            score_avg = self.weighted_score_sum_ / self.batch_size_sum_
+        else:
+            # The scores were not recorded by this callback (or not at
+            # all), so look them up in the history.
+            try:  # don't raise if there is no valid data
+                history[-1, 'batches', :, self.name_]
+            except KeyError:
+                return
+            score_avg = self.get_avg_score(history)
 
-        score_avg = self.get_avg_score(history)
         is_best = self._is_best_score(score_avg)
         if is_best:
             self.best_score_ = score_avg
@@ -421,10 +484,7 @@ class EpochScoring(ScoringBase):
         if self.use_caching:
             X_test = dataset
             y_pred = self.y_preds_
-            y_test = [self.target_extractor(y) for y in self.y_trues_]
-            # In case of y=None we will not have gathered any samples.
-            # We expect the scoring function to deal with y_test=None.
-            y_test = np.concatenate(y_test) if y_test else None
+            y_test = self._extract_cached_targets()
             return X_test, y_test, y_pred
 
         if is_skorch_dataset(dataset):
@@ -442,6 +502,23 @@ class EpochScoring(ScoringBase):
             y_test = self.target_extractor(y_test)
         return X_test, y_test, []
 
+    def _extract_cached_targets(self):
+        y_trues = self.y_trues_
+        if not y_trues:
+            # In case of y=None we will not have gathered any samples.
+            # We expect the scoring function to deal with y_test=None.
+            return None
+
+        if (
+                self.target_extractor is to_numpy
+                and all(isinstance(y, torch.Tensor) for y in y_trues)
+        ):
+            # Concatenate on the device so that targets on a GPU are
+            # copied to the host once instead of once per batch, each
+            # copy blocking until all queued kernels are done.
+            return to_numpy(torch.cat(y_trues))
+        return np.concatenate([self.target_extractor(y) for y in y_trues])
+
     def _record_score(self, history, current_score):
         """Record the current store and, if applicable, if it's the best score
         yet.
@@ -529,9 +606,10 @@ class PassthroughScoring(Callback):
         else:
             bs_key = 'valid_batch_size'
 
-        weights, scores = list(zip(
-            *history[-1, 'batches', :, [bs_key, self.name]]))
-        score_avg = np.average(scores, weights=weights)
+        # one array of (batch size, score) rows instead of two tuples
+        rows = history[-1, 'batches', :, [bs_key, self.name]]
+        weights_scores = np.asarray(rows, dtype=np.float64)
+        score_avg = np.average(weights_scores[:, 1], weights=weights_scores[:, 0])
         return score_avg
 
     # pylint: disable=unused-argument,arguments-differ
@@ -5,6 +5,38 @@ import numpy as np
 from skorch.dataset import unpack_data
 
 
+def tensor_scorer(func):
+    """Mark a scoring function as being able to deal with torch tensors
+
+    :class:`.BatchScoring` normally passes the target through its
+    ``target_extractor`` (by default :func:`~skorch.utils.to_numpy`)
+    before calling the scoring function. For scoring functions
+    decorated with ``tensor_scorer``, this step is skipped and the
+    target is passed as is, e.g. as a tensor on the GPU. This saves
+    one device to host copy per batch.
+
+    >>> @tensor_scorer
+    ... def accuracy(net, X, y):
+    ...     y_pred = net.infer(X).argmax(-1)
+    ...     return (y_pred == y).float().mean().item()
+    >>> net = NeuralNetClassifier(..., callbacks=[BatchScoring(accuracy)])
+
+    Parameters
+    ----------
+    func : callable
+      A scoring function with signature ``(net, X, y)``.
+
+    Returns
+    -------
+    func : callable
+      The same function, with the attribute ``accepts_tensor`` set to
+      True.
+
+    """
+    func.accepts_tensor = True
+    return func
+
+
 def loss_scoring(net, X, y=None, sample_weight=None):
     """Calculate score using the criterion of the net
 
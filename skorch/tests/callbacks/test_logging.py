@@ -705,6 +705,15 @@ class TestProgressBar:
         net = pickle.loads(dump)
         net.fit(*data)
 
+    def test_pickle_before_fit(self, net_cls, progressbar_cls):
+        # e.g. GridSearchCV with n_jobs > 1 pickles the unfitted net
+        import pickle
+
+        net = net_cls(callbacks=[
+            progressbar_cls(),
+        ])
+        pickle.loads(pickle.dumps(net))
+
 
 @pytest.mark.skipif(
     not tensorboard_installed, reason='tensorboard is not installed')
@@ -7,6 +7,7 @@ from unittest.mock import patch
 import numpy as np
 from sklearn.metrics import accuracy_score, make_scorer
 import pytest
+import torch
 
 from skorch.utils import to_numpy
 
@@ -479,6 +480,29 @@ class TestEpochScoring:
         with pytest.raises(ValueError, match=msg):
                 net.fit(*data)
 
+    def test_cached_tensor_targets_concatenated_once(self, caching_scoring_cls):
+        cb = caching_scoring_cls('accuracy').initialize()
+        cb.y_trues_ = [torch.arange(3), torch.arange(3, 5)]
+
+        with patch('skorch.callbacks.scoring.torch.cat',
+                   side_effect=torch.cat) as cat:
+            _, y_test, _ = cb.get_test_data(None, 'data')
+
+        assert cat.call_count == 1
+        assert isinstance(y_test, np.ndarray)
+        assert (y_test == np.arange(5)).all()
+
+    def test_cached_targets_custom_target_extractor(self, caching_scoring_cls):
+        target_extractor = Mock(side_effect=lambda y: np.asarray(y) + 1)
+        cb = caching_scoring_cls(
+            'accuracy', target_extractor=target_extractor).initialize()
+        cb.y_trues_ = [torch.arange(3), torch.arange(3, 5)]
+
+        _, y_test, _ = cb.get_test_data(None, 'data')
+
+        assert target_extractor.call_count == 2
+        assert (y_test == np.arange(1, 6)).all()
+
     @pytest.mark.parametrize('use_caching, count', [(False, 1), (True, 0)])
     def test_with_caching_get_iterator_not_called(
             self, net_cls, module_cls, train_split, caching_scoring_cls, data,
@@ -621,6 +645,37 @@ class TestBatchScoring:
 
         assert history[-1, 'train_loss'] == 10
 
+    def test_average_from_running_sums(self, net_cls, module_cls):
+        from skorch.callbacks import BatchScoring
+
+        # 5 validation samples with a batch size of 3 result in
+        # validation batches of different sizes (3 and 2).
+        X = np.arange(8).astype(np.float32).reshape(-1, 1)
+        y = (X ** 2).astype(np.float32)
+
+        def train_split(dataset, y):
+            # pylint: disable=unused-argument
+            ds_train = type(dataset)(dataset.X[:3], dataset.y[:3])
+            ds_valid = type(dataset)(dataset.X[3:], dataset.y[3:])
+            return ds_train, ds_valid
+
+        scoring = BatchScoring('neg_mean_squared_error', name='nmse')
+        net = net_cls(
+            module_cls, batch_size=3, train_split=train_split,
+            callbacks=[scoring], max_epochs=2)
+
+        with patch.object(BatchScoring, 'get_avg_score') as get_avg_score:
+            net.fit(X, y)
+        get_avg_score.assert_not_called()
+
+        for row in net.history:
+            scores = [b['nmse'] for b in row['batches'] if 'nmse' in b]
+            weights = [b['valid_batch_size'] for b in row['batches']
+                       if 'nmse' in b]
+            assert weights == [3, 2]
+            assert not np.isclose(scores[0], scores[1])
+            assert np.isclose(row['nmse'], np.average(scores, weights=weights))
+
     def test_average_honors_weights(self, train_loss, history):
         """The batches may have different batch sizes, which is why it
         necessary to honor the batch sizes. Here we use different
@@ -885,6 +940,28 @@ class TestBatchScoring:
 
         assert extractor.call_count == 2 * 2
 
+    def test_target_extractor_skipped_for_tensor_scorer(
+            self, net_cls, module_cls, train_split, scoring_cls, data):
+        import torch
+        from skorch.scoring import tensor_scorer
+
+        y_types = []
+
+        @tensor_scorer
+        def myscore(net, X, y):  # pylint: disable=unused-argument
+            y_types.append(type(y))
+            return 0.0
+
+        extractor = Mock(side_effect=to_numpy)
+        net = net_cls(
+            module_cls, batch_size=1, train_split=train_split,
+            callbacks=[scoring_cls(myscore, target_extractor=extractor)],
+            max_epochs=2)
+        net.fit(*data)
+
+        assert extractor.call_count == 0
+        assert y_types == [torch.Tensor] * 2 * 2
+
     def test_without_target_data_works(
             self, net_cls, module_cls, scoring_cls, data,
     ):
@@ -917,6 +994,56 @@ class TestBatchScoring:
         loss = net.history[:, 'myscore']
         assert np.allclose(loss, expected)
 
+    def test_scorer_is_resolved_only_once(
+            self, net_cls, module_cls, train_split, scoring_cls, data):
+        from skorch.callbacks import scoring as scoring_module
+
+        scoring = scoring_cls(
+            name='nmse',
+            scoring='neg_mean_squared_error',
+        )
+        net = net_cls(
+            module_cls, batch_size=1, train_split=train_split,
+            callbacks=[scoring], max_epochs=2)
+
+        side_effect = scoring_module.check_scoring
+        with patch.object(scoring_module, 'check_scoring',
+                          side_effect=side_effect) as check_scoring:
+            net.fit(*data)
+
+        assert check_scoring.call_count == 1
+
+    def test_name_is_determined_only_once(
+            self, net_cls, module_cls, train_split, scoring_cls, data):
+        from skorch.callbacks.scoring import ScoringBase
+
+        scoring = scoring_cls(scoring='neg_mean_squared_error')
+        net = net_cls(
+            module_cls, batch_size=1, train_split=train_split,
+            callbacks=[scoring], max_epochs=2)
+
+        side_effect = ScoringBase._get_name
+        with patch.object(ScoringBase, '_get_name', autospec=True,
+                          side_effect=side_effect) as get_name:
+            net.fit(*data)
+
+        assert get_name.call_count == 1
+        assert net.history[:, 'neg_mean_squared_error']
+
+    def test_set_params_scoring_resets_scorer(self, scoring_cls, score55):
+        scoring = scoring_cls(scoring='neg_mean_squared_error').initialize()
+        scoring.scorer_ = Mock()
+
+        scoring.set_params(scoring=score55)
+        assert scoring.scoring_ is score55
+        assert scoring.scorer_ is None
+        assert scoring.name_ == 'score55'
+
+    def test_set_params_name_resets_name(self, scoring_cls):
+        scoring = scoring_cls(scoring='neg_mean_squared_error').initialize()
+        scoring.set_params(name='nmse')
+        assert scoring.name_ == 'nmse'
+
     def test_scoring_with_cache_and_fit_interrupt_resets_infer(
             self, net_cls, module_cls, scoring_cls, data, train_split):
         # This test addresses a bug that occurred with caching in
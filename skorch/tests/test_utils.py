@@ -1,6 +1,7 @@
 """Test for utils.py"""
 
 from copy import deepcopy
+from unittest.mock import Mock
 
 import numpy as np
 import pytest
@@ -112,6 +113,19 @@ class TestToTensor:
         assert self.tensors_equal(result, expected)
         assert self.tensors_equal(expected, result)
 
+    @pytest.mark.parametrize('X', [55, 1.5, np.int64(3), np.float32(0.5)])
+    def test_scalar_conversion(self, to_tensor, X):
+        result = to_tensor(X, device='cpu')
+        assert result.dim() == 0
+        assert result.item() == X
+
+    def test_ndarray_conversion_shares_memory(self, to_tensor):
+        # on CPU, numpy arrays should not be copied
+        X = np.zeros((5, 3))
+        result = to_tensor(X, device='cpu')
+        X[0, 0] = 1
+        assert result[0, 0] == 1
+
     @pytest.mark.parametrize('device', ['cpu', 'cuda'])
     def test_sparse_tensor(self, to_tensor, device):
         if device == 'cuda' and not torch.cuda.is_available():
@@ -170,6 +184,16 @@ class TestToNumpy:
         x_numpy = to_numpy(x_tensor)
         self.compare_array_to_tensor(x_numpy, x_tensor)
 
+    def test_cpu_tensor_is_not_copied(self, to_numpy, x_tensor):
+        x_numpy = to_numpy(x_tensor)
+        x_numpy[0, 0] = 1
+        assert x_tensor[0, 0] == 1
+
+    def test_tensor_requires_grad(self, to_numpy, x_tensor):
+        x_tensor.requires_grad_()
+        x_numpy = to_numpy(x_tensor)
+        self.compare_array_to_tensor(x_numpy, x_tensor)
+
     def test_list(self, to_numpy, x_list):
         x_numpy = to_numpy(x_list)
         for entry_numpy, entry_torch in zip(x_numpy, x_list):
@@ -337,6 +361,31 @@ class TestToDevice:
         x_pad_seq = to_device(x_pad_seq, device=device_to)
         self.check_device_type(x_pad_seq.data, device_to, prev_device)
 
+    @pytest.mark.parametrize('device, is_pinned, non_blocking', [
+        ('cuda', True, True),
+        ('cuda:0', True, True),
+        (torch.device('cuda'), True, True),
+        ('cuda', False, False),
+        ('cpu', True, False),
+    ])
+    def test_non_blocking_copy_from_pinned_memory(
+            self, to_device, device, is_pinned, non_blocking):
+        x = Mock(spec=torch.Tensor)
+        x.is_pinned.return_value = is_pinned
+
+        to_device(x, device=device)
+        if non_blocking:
+            x.to.assert_called_once_with(device, non_blocking=True)
+        else:
+            x.to.assert_called_once_with(device)
+
+    @pytest.mark.skipif(not torch.cuda.is_available(), reason="no cuda device")
+    def test_pinned_tensor_to_cuda(self, to_device, x):
+        x = x.pin_memory()
+        result = to_device(x, device='cuda')
+        assert result.device.type == 'cuda'
+        assert (result.cpu() == x).all()
+
     @pytest.mark.parametrize('device_from, device_to', [
         ('cpu', 'cpu'),
         ('cpu', 'cuda'),
@@ -417,6 +466,15 @@ class TestParamsFor:
     def test_params_for(self, params_for, prefix, kwargs, expected):
         assert params_for(prefix, kwargs) == expected
 
+    def test_params_for_reflects_changes_to_kwargs(self, params_for):
+        kwargs = {'p1__a': 1}
+        result = params_for('p1', kwargs)
+        result['b'] = 2
+        assert params_for('p1', kwargs) == {'a': 1}
+
+        kwargs['p1__a'] = 3
+        assert params_for('p1', kwargs) == {'a': 3}
+
 
 class TestDataFromDataset:
     @pytest.fixture
@@ -596,6 +654,31 @@ class TestMultiIndexing:
             np.s_[:2],
             {'a': np.arange(2), 'b': np.arange(3, 5)}
         ),
+        (
+            {'a': torch.arange(0, 3), 'b': torch.arange(3, 6)},
+            np.array([2, 0, 2]),
+            {'a': np.array([2, 0, 2]), 'b': np.array([5, 3, 5])}
+        ),
+        (
+            {'a': torch.arange(0, 3), 'b': torch.arange(3, 6)},
+            np.array([1, 0, 1], dtype=np.uint8),
+            {'a': np.array([0, 2]), 'b': np.array([3, 5])}
+        ),
+        (
+            {'a': torch.arange(0, 3), 'b': torch.arange(3, 6)},
+            np.array([-1, 0]),
+            {'a': np.array([2, 0]), 'b': np.array([5, 3])}
+        ),
+        (
+            {'a': torch.arange(0, 3), 'b': torch.arange(3, 6)},
+            np.array([True, False, True]),
+            {'a': np.array([0, 2]), 'b': np.array([3, 5])}
+        ),
+        (
+            {'a': torch.arange(0, 3), 'b': torch.arange(3, 6)},
+            np.array([], dtype=np.int64),
+            {'a': np.array([]), 'b': np.array([])}
+        ),
     ])
     def test_dict_of_torch_tensors(self, multi_indexing, data, i, expected):
         result = multi_indexing(data, i)
@@ -607,6 +690,33 @@ class TestMultiIndexing:
                 val = result[k]
             assert np.allclose(val, expected[k])
 
+    @pytest.mark.parametrize('i', [
+        np.array([1, 0, 1], dtype=np.uint8),
+        np.array([True, False, True]),
+        np.array([-1, 0, 1]),
+    ])
+    def test_dict_of_torch_tensors_like_tensor(self, multi_indexing, i):
+        # indexing a tensor in a dict gives the same result as indexing
+        # the tensor itself
+        data = torch.arange(6, 12)
+        result = multi_indexing({'a': data}, i)['a']
+        expected = multi_indexing(data, i)
+        assert torch.equal(result, expected)
+
+    def test_dict_of_mixed_data_ndarray_index(self, multi_indexing):
+        data = {
+            'a': torch.arange(0, 3),
+            'b': np.arange(3, 6),
+            'c': torch.arange(6, 12).view(3, 2),
+        }
+        result = multi_indexing(data, np.array([2, 0]))
+
+        assert isinstance(result['a'], torch.Tensor)
+        assert isinstance(result['b'], np.ndarray)
+        assert (result['a'].numpy() == [2, 0]).all()
+        assert (result['b'] == [5, 3]).all()
+        assert (result['c'].numpy() == [[10, 11], [6, 7]]).all()
+
     def test_mixed_data(self, multi_indexing):
         data = [
             [1, 2, 3],
@@ -695,6 +805,24 @@ class TestMultiIndexing:
         result = multi_indexing(X, i)
         assert (result == X[:100]).all()
 
+    def test_index_numpy_array_with_numpy_int_array(self, multi_indexing):
+        X = np.arange(10)
+        i = np.asarray([3, 1, 4])
+        result = multi_indexing(X, i)
+        assert np.allclose(result, [3, 1, 4])
+
+    def test_index_list_with_numpy_int_array(self, multi_indexing):
+        X = list(range(10))
+        i = np.asarray([3, 1, 4])
+        result = multi_indexing(X, i)
+        assert result == [3, 1, 4]
+
+    def test_index_list_with_numpy_bool_array(self, multi_indexing):
+        X = list(range(5))
+        i = np.asarray([True, False, True, False, True])
+        result = multi_indexing(X, i)
+        assert result == [0, 2, 4]
+
     def test_index_with_float_array_raises(self, multi_indexing):
         # sklearn < 0.22 raises IndexError with msg0
         # sklearn >= 0.22 raises ValueError with msg1
@@ -749,6 +877,26 @@ class TestMultiIndexing:
         assert np.allclose(result, expected)
 
 
+class TestIsTorchDataType:
+
+    @pytest.fixture
+    def is_torch_data_type(self):
+        from skorch.utils import is_torch_data_type
+        return is_torch_data_type
+
+    @pytest.mark.parametrize('input_data, expected', [
+        (torch.zeros(3), True),
+        (torch.zeros(3, requires_grad=True), True),
+        (torch.nn.Parameter(torch.zeros(3)), True),
+        (pack_padded_sequence(torch.zeros(2, 3), [2, 1], batch_first=True), True),
+        (np.zeros(3), False),
+        ([1, 2, 3], False),
+        (1.0, False),
+    ])
+    def test_data_types(self, is_torch_data_type, input_data, expected):
+        assert is_torch_data_type(input_data) == expected
+
+
 class TestIsSkorchDataset:
 
     @pytest.fixture
@@ -771,13 +919,17 @@ class TestIsSkorchDataset:
         torch_subset = Subset(torch_dataset, [1, 2])
         skorch_dataset = Dataset(numpy_data)
         skorch_subset = Subset(skorch_dataset, [1, 2])
+        nested_torch_subset = Subset(torch_subset, [0])
+        nested_skorch_subset = Subset(skorch_subset, [0])
 
         return [
             (numpy_data, False),
             (torch_dataset, False),
             (torch_subset, False),
+            (nested_torch_subset, False),
             (skorch_dataset, True),
             (skorch_subset, True),
+            (nested_skorch_subset, True),
         ]
 
     @pytest.mark.parametrize(
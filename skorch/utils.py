@@ -41,7 +41,8 @@ class Ansi(Enum):
 
 
 def is_torch_data_type(x):
-    # pylint: disable=protected-access
+    # Not just torch.is_tensor: a PackedSequence is no tensor but
+    # should be treated like one by to_tensor, to_numpy etc.
     return isinstance(x, (torch.Tensor, PackedSequence))
 
 
@@ -110,7 +111,9 @@ def to_numpy(X):
     data structures (e.g., dicts, lists, etc.) but doesn't go
     beyond.
 
-    Returns X when it already is a numpy array.
+    Returns X when it already is a numpy array. Tensors that are
+    already on CPU are not copied, the returned array shares their
+    memory.
 
     """
     if isinstance(X, np.ndarray):
@@ -128,12 +131,14 @@ def to_numpy(X):
     if not is_torch_data_type(X):
         raise TypeError("Cannot convert this data type to a numpy array.")
 
-    if X.is_cuda:
-        X = X.cpu()
-
+    # detach before moving to CPU so that autograd doesn't record the
+    # device copy
     if X.requires_grad:
         X = X.detach()
 
+    if X.is_cuda:
+        X = X.cpu()
+
     return X.numpy()
 
 
@@ -153,7 +158,8 @@ def to_device(X, device):
 
     device : str, torch.device
         The compute device to be used. If device=None, return the input
-        unmodified
+        unmodified. Tensors in pinned memory are copied to CUDA devices
+        without blocking.
 
     """
     if device is None:
@@ -165,6 +171,15 @@ def to_device(X, device):
     # PackedSequence class inherits from a namedtuple
     if isinstance(X, (tuple, list)) and (type(X) != PackedSequence):
         return type(X)(to_device(x, device) for x in X)
+
+    # copying from pinned memory to a CUDA device can happen
+    # asynchronously, overlapping with computations already queued
+    if (
+            isinstance(X, torch.Tensor) and
+            torch.device(device).type == 'cuda' and
+            X.is_pinned()
+    ):
+        return X.to(device, non_blocking=True)
     return X.to(device)
 
 
@@ -185,11 +200,16 @@ def is_pandas_ndframe(x):
 
 
 def flatten(arr):
-    for item in arr:
-        if isinstance(item, (tuple, list, dict)):
-            yield from flatten(item)
-        else:
+    # iterative instead of recursive to avoid nested generator frames
+    stack = [iter(arr)]
+    while stack:
+        for item in stack[-1]:
+            if isinstance(item, (tuple, list, dict)):
+                stack.append(iter(item))
+                break
             yield item
+        else:
+            stack.pop()
 
 
 # pylint: disable=unused-argument
@@ -198,9 +218,54 @@ def _indexing_none(data, i):
 
 
 def _indexing_dict(data, i):
+    if isinstance(i, np.ndarray) and i.ndim == 1:
+        return _indexing_dict_ndarray(data, i)
     return {k: v[i] for k, v in data.items()}
 
 
+def _indexing_dict_ndarray(data, i):
+    """Index a dict with a 1d integer or boolean array.
+
+    Instead of letting each tensor convert the numpy index again, it is
+    converted to a torch index only once (per device and length) and
+    then used to gather the rows of every tensor with ``index_select``.
+    As when indexing a tensor directly, a ``uint8`` array is treated as
+    a mask for tensors.
+
+    """
+    # masks result in non-negative positions, so only a signed integer
+    # index has to be checked for negative values
+    wrap = False
+    if i.dtype == bool:
+        i = positions = np.flatnonzero(i)
+    elif i.dtype == np.uint8:
+        positions = np.flatnonzero(i)
+    elif np.issubdtype(i.dtype, np.integer):
+        positions = i
+        wrap = np.issubdtype(i.dtype, np.signedinteger)
+    else:
+        return {k: v[i] for k, v in data.items()}
+
+    indices = {}
+    result = {}
+    for k, v in data.items():
+        if not isinstance(v, torch.Tensor) or not v.dim():
+            result[k] = v[i]
+            continue
+
+        key = (v.device, len(v))
+        idx = indices.get(key)
+        if idx is None:
+            idx = positions
+            if wrap:
+                # index_select doesn't support negative indices
+                idx = np.where(idx < 0, idx + len(v), idx)
+            idx = indices[key] = torch.as_tensor(
+                idx.astype(np.int64, copy=False), device=v.device)
+        result[k] = v.index_select(0, idx)
+    return result
+
+
 def _indexing_list_tuple_of_data(data, i, indexings=None):
     """Data is a list/tuple of data structures (e.g. list of numpy arrays).
 
@@ -228,6 +293,12 @@ def _indexing_other(data, i):
     # sklearn's safe_indexing doesn't work with tuples since 0.22
     if isinstance(i, (int, np.integer, slice, tuple)):
         return data[i]
+    if isinstance(i, np.ndarray):
+        if isinstance(data, (np.ndarray, torch.Tensor)):
+            # integer and boolean arrays are supported natively
+            return data[i]
+        if i.dtype == bool:
+            i = np.flatnonzero(i)
     return safe_indexing(data, i)
 
 
@@ -268,17 +339,6 @@ def check_indexing(data):
     return _indexing_other
 
 
-def _normalize_numpy_indices(i):
-    """Normalize the index in case it is a numpy integer or boolean
-    array."""
-    if isinstance(i, np.ndarray):
-        if i.dtype == bool:
-            i = tuple(j.tolist() for j in i.nonzero())
-        elif i.dtype == int:
-            i = i.tolist()
-    return i
-
-
 def multi_indexing(data, i, indexing=None):
     """Perform indexing on multiple data structures.
 
@@ -327,9 +387,6 @@ def multi_indexing(data, i, indexing=None):
       None, try to automatically determine how to index data.
 
     """
-    # in case of i being a numpy array
-    i = _normalize_numpy_indices(i)
-
     # If we already know how to index, use that knowledge
     if indexing is not None:
         return indexing(data, i)
@@ -377,7 +434,10 @@ def params_for(prefix, kwargs):
     """
     if not prefix.endswith('__'):
         prefix += '__'
-    return {key[len(prefix):]: val for key, val in kwargs.items()
+    # Note: the result must not be cached, kwargs is typically the
+    # (mutable) __dict__ of the net and callers modify the result.
+    n = len(prefix)
+    return {key[n:]: val for key, val in kwargs.items()
             if key.startswith(prefix)}
 
 
@@ -427,8 +487,8 @@ def is_skorch_dataset(ds):
     ``skorch.dataset.Dataset`` even when it is nested inside
     ``torch.util.data.Subset``."""
     from skorch.dataset import Dataset
-    if isinstance(ds, Subset):
-        return is_skorch_dataset(ds.dataset)
+    while isinstance(ds, Subset):
+        ds = ds.dataset
     return isinstance(ds, Dataset)
 
 